@@ -4,17 +4,35 @@ import cv2
 import os
 import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from functools import lru_cache
 
 # Configuration
 OCR_CONFIDENCE_THRESHOLD = 0.85
 SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'}
+def paddle_gpu_available():
+    """True when Paddle is built with CUDA and can see a device."""
+    try:
+        import paddle
+        return paddle.device.is_compiled_with_cuda() and paddle.device.cuda.device_count() > 0
+    except Exception:
+        return False
 
-# Initialize OCR
-ocr = PaddleOCR(
-    use_doc_orientation_classify=False,
-    use_doc_unwarping=False,
-    use_textline_orientation=False
-)
+# Each worker process loads its own PaddleOCR models, so keep the pool small. On a GPU
+# every worker would put another copy of the models on the same device, so run one
+# process there and leave more workers to an explicit -j.
+DEFAULT_WORKERS = 1 if paddle_gpu_available() else min(4, os.cpu_count() or 1)
+
+# Initialize OCR on first use, once per process. Spawned workers re-import this
+# module, so a module-level instance would also load models in the parent for nothing.
+@lru_cache(maxsize=None)
+def get_ocr():
+    return PaddleOCR(
+        use_doc_orientation_classify=False,
+        use_doc_unwarping=False,
+        use_textline_orientation=False
+    )
 
 def get_edge_bounding_boxes(edges, min_contour_area=50, approx_epsilon_factor=0.02):
     """
@@ -50,6 +68,13 @@ def get_edge_bounding_boxes(edges, min_contour_area=50, approx_epsilon_factor=0.
     
     return bounding_boxes
 
+def box_corners(mins, maxs):
+    """
+    Build closed rectangle contours, shape (N, 4, 2), from (N, 2) top-left and bottom-right corners
+    """
+    return np.stack([mins, np.stack([maxs[:, 0], mins[:, 1]], axis=1),
+                     maxs, np.stack([mins[:, 0], maxs[:, 1]], axis=1)], axis=1).astype(np.int32)
+
 def draw_bounding_boxes(img, text_boxes, edge_boxes):
     """
     Draw both text and edge bounding boxes on the image
@@ -57,35 +82,27 @@ def draw_bounding_boxes(img, text_boxes, edge_boxes):
     result_img = img.copy()
     
     # Draw text bounding boxes in green
-    for box in text_boxes:
-        poly = box['poly']
-        text = box['text']
-        score = box['score']
-        
-        # Convert polygon to bounding rectangle
-        poly_np = np.array(poly)
-        x_coords = poly_np[:, 0]
-        y_coords = poly_np[:, 1]
+    if text_boxes:
+        # Bounding rectangles of all polygons at once, outlined in a single polylines call
+        polys = np.asarray([box['poly'] for box in text_boxes], dtype=np.float64)
+        mins = polys.min(axis=1).astype(np.int32)
+        maxs = polys.max(axis=1).astype(np.int32)
+        cv2.polylines(result_img, list(box_corners(mins, maxs)), True, (0, 255, 0), 2)
         
-        x_min = int(np.min(x_coords))
-        y_min = int(np.min(y_coords))
-        x_max = int(np.max(x_coords))
-        y_max = int(np.max(y_coords))
-        
-        # Draw rectangle and label
-        cv2.rectangle(result_img, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
-        cv2.putText(result_img, f"TEXT: {score:.2f}", (x_min, y_min-5), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        # Labels still need one call per box
+        for box, (x_min, y_min) in zip(text_boxes, mins.tolist()):
+            cv2.putText(result_img, f"TEXT: {box['score']:.2f}", (x_min, y_min-5), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
     
     # Draw edge bounding boxes in red
-    for i, box in enumerate(edge_boxes):
-        x, y, w, h = box['bbox']
-        area = box['area']
-        vertices = box['approx_vertices']
+    if edge_boxes:
+        bboxes = np.asarray([box['bbox'] for box in edge_boxes], dtype=np.int32)
+        cv2.polylines(result_img, list(box_corners(bboxes[:, :2], bboxes[:, :2] + bboxes[:, 2:])),
+                      True, (0, 0, 255), 2)
         
-        cv2.rectangle(result_img, (x, y), (x + w, y + h), (0, 0, 255), 2)
-        cv2.putText(result_img, f"EDGE: A={int(area)}", (x, y-5), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1)
+        for box, (x, y) in zip(edge_boxes, bboxes[:, :2].tolist()):
+            cv2.putText(result_img, f"EDGE: A={int(box['area'])}", (x, y-5), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1)
     
     return result_img
 
@@ -111,45 +128,40 @@ def process_single_image(img_path, output_dir, debug=False):
     
     try:
         # OCR Processing
-        result = ocr.predict(str(img_path))
+        result = get_ocr().predict(str(img_path))
         
         # Create a mask to remove text areas
         mask = np.zeros_like(edges)
         text_boxes = []
         
         print("--- OCR Results ---")
-        text_boxes_found = 0
         
-        for poly, text, score in zip(result[0]['rec_polys'], result[0]['rec_texts'], result[0]['rec_scores']):
-            if score > OCR_CONFIDENCE_THRESHOLD:
-                text_boxes_found += 1
-                print(f"Text: '{text}', Score: {score:.3f}")
-                
-                text_boxes.append({
-                    'poly': poly,
-                    'text': text,
-                    'score': score
-                })
-                
-                # Get bounding box coordinates
-                poly_np = np.array(poly)
-                x_coords = poly_np[:, 0]
-                y_coords = poly_np[:, 1]
-                
-                x_min = int(np.min(x_coords))
-                y_min = int(np.min(y_coords))
-                x_max = int(np.max(x_coords))
-                y_max = int(np.max(y_coords))
-                
-                # Expand the bounding box by a 4px margin
-                margin = 4
-                x_min_margin = max(0, x_min - margin)
-                y_min_margin = max(0, y_min - margin)
-                x_max_margin = min(img.shape[1], x_max + margin)
-                y_max_margin = min(img.shape[0], y_max + margin)
-                
-                # Fill the mask within the expanded bounding box
-                cv2.rectangle(mask, (x_min_margin, y_min_margin), (x_max_margin, y_max_margin), 255, -1)
+        # Apply the confidence threshold to all scores at once; only kept boxes reach Python
+        scores = np.asarray(result[0]['rec_scores'], dtype=np.float32)
+        keep = np.flatnonzero(scores > OCR_CONFIDENCE_THRESHOLD)
+        text_boxes_found = len(keep)
+        
+        for i in keep.tolist():
+            text = result[0]['rec_texts'][i]
+            score = result[0]['rec_scores'][i]
+            print(f"Text: '{text}', Score: {score:.3f}")
+            
+            text_boxes.append({
+                'poly': result[0]['rec_polys'][i],
+                'text': text,
+                'score': score
+            })
+        
+        if text_boxes_found:
+            # Bounding boxes of all kept polygons, expanded by a 4px margin and clipped to the image
+            polys = np.asarray([box['poly'] for box in text_boxes], dtype=np.float32)
+            margin = 4
+            mins = np.clip(polys.min(axis=1).astype(np.int32) - margin, 0, None)
+            maxs = np.minimum(polys.max(axis=1).astype(np.int32) + margin, [img.shape[1], img.shape[0]])
+            
+            # Fill the mask within each expanded bounding box (inclusive, like cv2.rectangle)
+            for (x_min, y_min), (x_max, y_max) in zip(mins.tolist(), maxs.tolist()):
+                mask[y_min:y_max + 1, x_min:x_max + 1] = 255
         
         print(f"Total high-confidence text boxes found: {text_boxes_found}")
         
@@ -193,9 +205,9 @@ def process_single_image(img_path, output_dir, debug=False):
         print(f"Error during processing: {e}")
         return False
 
-def process_directory(input_dir, output_dir=None, debug=False):
+def process_directory(input_dir, output_dir=None, debug=False, workers=DEFAULT_WORKERS):
     """
-    Process all images in a directory
+    Process all images in a directory, spreading images over `workers` processes
     """
     input_path = Path(input_dir)
     
@@ -234,12 +246,32 @@ def process_directory(input_dir, output_dir=None, debug=False):
     # Process each image
     successful = 0
     failed = 0
+    workers = max(1, min(workers, len(image_files)))
     
-    for img_file in image_files:
-        if process_single_image(img_file, output_dir, debug):
-            successful += 1
-        else:
-            failed += 1
+    if workers == 1:
+        for img_file in image_files:
+            if process_single_image(img_file, output_dir, debug):
+                successful += 1
+            else:
+                failed += 1
+    else:
+        # PaddleOCR predict is not thread-safe, so use processes; spawn gives every
+        # worker a fresh interpreter, which creates its own OCR instance via get_ocr()
+        print(f"Processing with {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(process_single_image, img_file, output_dir, debug)
+                       for img_file in image_files]
+            for future in as_completed(futures):
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    print(f"Error in worker process: {e}")
+                    ok = False
+                if ok:
+                    successful += 1
+                else:
+                    failed += 1
     
     print(f"\n=== Processing Complete ===")
     print(f"Successfully processed: {successful}")
@@ -252,8 +284,10 @@ if __name__ == "__main__":
     parser.add_argument('input_dir', help='Input directory containing images')
     parser.add_argument('-o', '--output', help='Output directory (default: input_dir/annotated_output)')
     parser.add_argument('--debug', action='store_true', help='Export cleaned edges and intermediate images')
+    parser.add_argument('-j', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Number of worker processes (default: {DEFAULT_WORKERS})')
     
     args = parser.parse_args()
     
     # Process the directory with the specified arguments
-    process_directory(args.input_dir, args.output, args.debug)
\ No newline at end of file
+    process_directory(args.input_dir, args.output, args.debug, args.workers)
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import re
 import time
 import asyncio
 import concurrent.futures
@@ -15,6 +16,9 @@ import threading
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Anything that is not alphanumeric or one of '-_.' becomes '_'
+UNSAFE_FILENAME_CHARS = re.compile(r'[^\w.-]')
+
 def setup_driver():
     """Set up Chrome WebDriver with optimal settings for screenshots"""
     chrome_options = Options()
@@ -42,9 +46,7 @@ def sanitize_filename(url):
     # Remove protocol and www
     domain = url.replace('https://', '').replace('http://', '').replace('www.', '')
     # Replace invalid characters
-    safe_chars = '-_.'
-    sanitized = ''.join(c if c.isalnum() or c in safe_chars else '_' for c in domain)
-    return sanitized
+    return UNSAFE_FILENAME_CHARS.sub('_', domain)
 
 def take_screenshot(driver, url, output_dir, thread_id):
     """Take a screenshot at 1920x1080 and downscale to 1139x640 for saving"""
@@ -10,17 +10,19 @@ Full replacement for client_endpoint.py – original functionality +:
 from flask import Flask, jsonify, request
 from flask_cors import CORS # ADDED: Import CORS
 import asyncio, threading, uuid, os, time, base64, hashlib, io, json
+import logging, logging.handlers, queue, sys, atexit
+from collections import OrderedDict
 import networkx as nx
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from browser_use import Agent
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import numpy as np
 import matplotlib
 matplotlib.use("Agg")                    # headless rendering
 import matplotlib.pyplot as plt
 from types import SimpleNamespace
+from urllib.parse import urljoin, urldefrag
 from matplotlib.colors import LinearSegmentedColormap
 from scipy.ndimage import gaussian_filter   
 
@@ -63,11 +65,29 @@ agent_running    = False
 click_heat_sum   = 0.0
 click_count      = 0
 
+# Per-click log lines go through a queue; a listener thread does the
+# formatting and stdout writes so the click binding never blocks on I/O.
+click_log   = logging.getLogger("uicheck.clicks")
+_log_queue  = queue.SimpleQueue()
+click_log.addHandler(logging.handlers.QueueHandler(_log_queue))
+click_log.setLevel(logging.INFO)
+click_log.propagate = False
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler(sys.stdout))
+_log_listener.start()
+atexit.register(_log_listener.stop)        # flush lines still queued at shutdown
+
 # Global click tracking system
 global_click_buffer = []                    # [{url, x, y, ts, processed}, ...]
+MAX_PENDING_CLICKS  = 10000                 # oldest unmatched clicks dropped past this
 global_click_lock = threading.Lock()
 last_processed_url = ""
 
+# Page metrics keyed by screenshot content, so a step that leaves the
+# page visually unchanged (same URL or not) skips the scoring models.
+page_metrics_cache = OrderedDict()          # {blake2b(png): (color, font, neural, alignment)}, LRU
+MAX_CACHED_PAGES   = 256
+written_digests    = {}                     # {snapshot path: blake2b of last write}
+
 # ─────────────────────────────────────  Maths helpers
 from math import exp
 def click_heat(u: float, v: float) -> float:
@@ -118,6 +138,32 @@ def render_heatmap(grid: int = 256, sigma: float = 60) -> str:
     plt.savefig(buf, format="png", bbox_inches="tight", pad_inches=0)
     plt.close(fig)
     return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+
+# ─────────────────────────────────────  File & URL helpers
+def write_if_changed(path: str, data: bytes) -> bytes:
+    """Write *data* to *path* unless the last write there was identical.
+
+    Returns the content digest so callers can reuse it as a cache key.
+    """
+    digest = hashlib.blake2b(data, digest_size=16).digest()
+    if written_digests.get(path) != digest:
+        with open(path, "wb") as f: f.write(data)
+        written_digests[path] = digest
+    return digest
+
+def canonical_link(base: str, href: str):
+    """Absolute, fragment-free form of *href*; None for non-web links.
+
+    Keeps '/about', '/about#team' and 'https://site/about' as one sitemap
+    node instead of three, and drops mailto:/javascript: targets the
+    crawler could never visit.
+    """
+    try:
+        link = urldefrag(urljoin(base, href.strip())).url
+    except ValueError:            # malformed href, e.g. 'http://[::1'
+        return None
+    return link if link.startswith(("http://", "https://")) else None
+
 # ─────────────────────────  helper to locate Playwright Page
 async def _resolve_active_page(agent_obj):
     """Return the active page using browser-use's recommended method."""
@@ -152,6 +198,13 @@ async def record_activity(agent_obj):
     if pg is None:
         print("record_activity: cannot resolve page – skipping step.")
         return
+
+    # Let an in-flight navigation finish before capturing. Returns at once
+    # when the page is already loaded, unlike a fixed sleep.
+    try:
+        await pg.wait_for_load_state("load", timeout=2000)
+    except PlaywrightTimeoutError:
+        pass
     
     current_url = pg.url
     
@@ -192,6 +245,9 @@ async def record_activity(agent_obj):
             if not click.get("processed", False) and click["url"] == current_url:
                 current_page_clicks.append(click)
                 click["processed"] = True
+        # Drop handled clicks so the buffer scanned every step stays bounded
+        global_click_buffer[:] = [c for c in global_click_buffer
+                                  if not c.get("processed", False)][-MAX_PENDING_CLICKS:]
 
     vwvh = pg.viewport_size or {"width": 1, "height": 1}   # property, no ()
     vw   = vwvh.get("width", 1)
@@ -200,7 +256,7 @@ async def record_activity(agent_obj):
     click_records = []
     for click in current_page_clicks:
         x, y, ts = click["x"], click["y"], click["ts"]
-        print(f"Click at ({x}, {y}) on {current_url} @ {ts}")
+        click_log.info("Click at (%s, %s) on %s @ %s", x, y, current_url, ts)
         u, v = x/vw, y/vh
         h    = click_heat(u, v)
         click_records.append({"x":int(x),"y":int(y),"ts":ts/1000.0,
@@ -213,9 +269,13 @@ async def record_activity(agent_obj):
         site_avg = 0.0
         print("No clicks recorded yet, site avg heat = 0.0")
 
-    # ---- capture DOM / screenshot / metrics ---------------------------
-    html      = await pg.content()
-    screenshot_bytes = await pg.screenshot()
+    # ---- capture DOM / screenshot / links (one round-trip window) ------
+    html, screenshot_bytes, hrefs = await asyncio.gather(
+        pg.content(),
+        pg.screenshot(),
+        pg.eval_on_selector_all(
+            "a[href]", "els => els.map(a => a.getAttribute('href'))"),
+    )
     url       = current_url
     t_now     = time.time()
     url_hash  = hashlib.md5(url.encode()).hexdigest()
@@ -225,25 +285,41 @@ async def record_activity(agent_obj):
     os.makedirs("html",        exist_ok=True)
     ss_path   = f"screenshots/{url_hash}.png"
     html_path = f"html/{url_hash}.html"
-    with open(html_path, "w", encoding="utf-8") as f: f.write(html)
-    with open(ss_path,  "wb")                      as f: f.write(screenshot_bytes)
-
-    # Build/expand graph
-    soup  = BeautifulSoup(html, "html.parser")
-    hrefs = [a["href"] for a in soup.find_all("a", href=True)]
-    sitemap_graph.add_node(url, color="green", timestamp=t_now)
-    for h in hrefs:
-        sitemap_graph.add_node(h, color="yellow")
-        sitemap_graph.add_edge(url, h)
-
-    # Metrics
-    page_color       = process_page_colors(ss_path)
-    font_score_data  = get_page_font_score(ss_path)
-    neural_score     = get_neural_score(ss_path)
-    alignment_score  = get_alignment_score(ss_path)
+    write_if_changed(html_path, html.encode("utf-8"))
+    shot_digest = write_if_changed(ss_path, screenshot_bytes)
+
+    # Build/expand graph, keyed by the same canonical form as the link targets so
+    # 'https://site/about#team' and a discovered '/about' share one node
+    # (files above stay named after the raw URL)
+    node = canonical_link(url, url) or url
+    sitemap_graph.add_node(node, color="green", timestamp=t_now)
+    links = {canonical_link(url, h) for h in hrefs}
+    links.discard(None)
+    links.discard(node)           # '#', '' and '#section' point back at this page
+    for h in links:
+        if h not in sitemap_graph:    # add_node would reset a visited page to yellow
+            sitemap_graph.add_node(h, color="yellow")
+        sitemap_graph.add_edge(node, h)
+
+    # Metrics (memoised on screenshot content)
+    metrics = page_metrics_cache.get(shot_digest)
+    if metrics is not None:
+        page_metrics_cache.move_to_end(shot_digest)
+    if metrics is None:
+        # The scorers are independent and CPU/GPU-bound: run them in worker
+        # threads so they overlap and the event loop keeps serving the browser.
+        loop = asyncio.get_running_loop()
+        metrics = tuple(await asyncio.gather(*(
+            loop.run_in_executor(None, scorer, ss_path)
+            for scorer in (process_page_colors, get_page_font_score,
+                           get_neural_score, get_alignment_score))))
+        page_metrics_cache[shot_digest] = metrics
+        if len(page_metrics_cache) > MAX_CACHED_PAGES:
+            page_metrics_cache.popitem(last=False)
+    page_color, font_score_data, neural_score, alignment_score = metrics
 
     # Store metrics on node
-    sitemap_graph.nodes[url].update({
+    sitemap_graph.nodes[node].update({
         "color_score": page_color["page_score"],
         "palette": page_color["palette_details"],
         "font_score": font_score_data["font_score"],
@@ -354,6 +430,8 @@ async def run_agent(task_description: str):
     global agent_running
     reset_site_font_accumulators()
     reset_color_analysis_globals()
+    page_metrics_cache.clear()
+    written_digests.clear()
 
     with browser_lock:
         if agent_running:
@@ -386,7 +464,8 @@ async def run_agent(task_description: str):
                         'processed': False
                     }
                     
-                    print(f"UICHECK: Click received via JS function: {click_data['x']}, {click_data['y']} on {click_data['url']}")
+                    click_log.info("UICHECK: Click received via JS function: %s, %s on %s",
+                                   click_data['x'], click_data['y'], click_data['url'])
                     
                     with global_click_lock:
                         global_click_buffer.append(click_data)
@@ -446,13 +525,8 @@ async def run_agent(task_description: str):
                 context=ctx
             )
 
-            async def step_hook(agent_obj):
-                """Delay before running record_activity."""
-                await asyncio.sleep(2)  # Introduce a 1-second delay
-                await record_activity(agent_obj)
-
             print("Running agent task…")
-            await agent.run(on_step_start=step_hook, max_steps=30)
+            await agent.run(on_step_start=record_activity, max_steps=30)
 
             print("Agent finished. Crawling remaining pages…")
             await crawl_unvisited(ctx, pg)
@@ -2,11 +2,33 @@ from fastai.vision.all import *
 from PIL import Image
 import pathlib # Added import
 import traceback # Import traceback
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+
+try:
+    import pyspng  # Optional SIMD PNG decoder, noticeably faster than PIL on large screenshots
+except ImportError:
+    pyspng = None
+
+# Run the scorer at reduced precision: fp16 autocast on GPU, int8 dynamic quantization on CPU
+REDUCED_PRECISION = True
+
+# Scores keyed by a digest of the screenshot bytes, so identical re-screenshots skip the model
+MAX_CACHED_SCORES = 1024
+neural_score_cache = OrderedDict()
+
+# Screenshots per forward pass when scoring a batch
+NEURAL_BATCH_SIZE = 16
 
 # Load the pre-trained model (replace 'path/to/your/resnet50_model.pkl' with the actual path)
 # Ensure your model is exported correctly using learn.export()
-def initialize_neural_model():
-    global learn  # Declare 'learn' as a global variable to access it in the function
+@lru_cache(maxsize=None)
+def get_learner():
+    """
+    Loads the exported learner the first time it is needed and reuses it for the
+    life of the process. Returns None if the model could not be loaded.
+    """
     try:
         # Add temporary patch for PosixPath issue on Windows
         temp = pathlib.PosixPath
@@ -23,35 +45,156 @@ def initialize_neural_model():
         if 'temp' in locals(): # Ensure temp was defined
             pathlib.PosixPath = temp
 
+    if learn is not None and torch.cuda.is_available():
+        # load_learner maps everything to the CPU; move model and transforms to the GPU
+        learn.dls.cuda()
+        learn.model.cuda().eval()
+        torch.backends.cudnn.benchmark = True  # Screenshots share one size, so tuned kernels are reused
+        print("Neural model running on CUDA.")
+
+    if learn is not None and REDUCED_PRECISION:
+        optimize_neural_model(learn)
+    return learn
+
+def initialize_neural_model():
+    """Loads the model up front so the first score request doesn't pay for it."""
+    get_learner()
+
+def optimize_neural_model(learn):
+    """
+    Lowers the precision of the loaded learner for faster inference.
+    On GPU the learner runs under fp16 mixed precision; on CPU the Linear layers of
+    the head are quantized to int8 (dynamic quantization does not cover Conv2d).
+    Leaves the learner untouched if the conversion fails.
+    """
+    try:
+        if torch.cuda.is_available():
+            learn.to_fp16()
+            print("Neural model running in fp16 mixed precision.")
+        else:
+            learn.model = torch.ao.quantization.quantize_dynamic(
+                learn.model.cpu().eval(), {torch.nn.Linear}, dtype=torch.qint8)
+            learn.dls.cpu()
+            print("Neural model head quantized to int8.")
+    except Exception as e:
+        print(f"Could not reduce neural model precision, using fp32: {e}")
+
+def screenshot_key(data):
+    """Returns a content digest of the screenshot bytes, used as the score cache key."""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def decode_screenshot(data):
+    """
+    Turns screenshot file bytes into a model input item.
+    PNGs are decoded with pyspng when it is installed (as an RGB uint8 array);
+    anything else is passed as bytes, which PILImage.create opens and converts to RGB.
+    """
+    if pyspng is not None and data[:8] == b"\x89PNG\r\n\x1a\n":
+        arr = pyspng.load(data)
+        if arr.dtype == np.uint8:
+            if arr.ndim == 2:
+                arr = np.repeat(arr[:, :, None], 3, axis=2)
+            elif arr.shape[2] < 3:
+                arr = np.repeat(arr[:, :, :1], 3, axis=2)
+            return np.ascontiguousarray(arr[:, :, :3])
+    return data
+
+def predict_batch(learn, items):
+    """
+    Runs decoded screenshot items straight through learn.model.
+    Opens items with PILImage.create and applies the learner's own transforms in validation
+    mode (resize, to-tensor, normalisation), as learn.predict does, but stacks them by hand
+    instead of building a DataLoader and going through get_preds' callback loop.
+    """
+    dl = learn.dls.valid
+    # load_learner rebuilds these Pipelines with split_idx=None, which turns on random
+    # crops in Resize/RandomResizedCrop; pin them to the validation split (split_idx=1)
+    # like learn.predict and test_dl do, so the same screenshot always gets the same score
+    after_item = Pipeline(dl.after_item.fs, split_idx=1)
+    after_batch = Pipeline(dl.after_batch.fs, split_idx=1)
+    batch = TensorImage(torch.stack([after_item(PILImage.create(item)) for item in items]))
+    device = dl.device or torch.device("cpu")
+    if device.type == "cuda":
+        # Copy the uint8 batch from pinned memory so the transfer is asynchronous;
+        # float conversion and normalisation then run on the GPU in after_batch
+        batch = batch.pin_memory().to(device, non_blocking=True)
+    else:
+        batch = batch.to(device)
+    batch = after_batch(batch)
+
+    learn.model.eval()
+    # to_fp16 only registers a callback, so apply autocast ourselves when on GPU
+    use_amp = REDUCED_PRECISION and batch.device.type == "cuda"
+    with torch.inference_mode(), torch.autocast(batch.device.type, enabled=use_amp):
+        out = learn.model(batch)
+    out = getattr(learn.loss_func, "activation", noop)(out.float())
+    return getattr(learn.loss_func, "decodes", noop)(out)
+
+def get_neural_scores(screenshot_paths):
+    """
+    Calculates neural scores for a batch of screenshots in one pass through the model.
+    Preprocesses all paths into batches and calls the model directly instead of
+    learn.predict per image, so the per-call FastAI/DataLoader overhead is skipped.
+    Screenshots whose bytes were already scored are served from neural_score_cache.
+    Returns a list of scores in the same order as screenshot_paths.
+    """
+    screenshot_paths = list(screenshot_paths)
+    learn = get_learner()
+    if learn is None:
+        return [3] * len(screenshot_paths)
+    if not screenshot_paths:
+        return []
+
+    try:
+        # Read every file once; the same bytes feed both the cache key and the decoder
+        blobs = []
+        for path in screenshot_paths:
+            with open(path, "rb") as f:
+                blobs.append(f.read())
+        keys = [screenshot_key(data) for data in blobs]
+
+        results = {}
+        to_score = {}
+        for path, key, data in zip(screenshot_paths, keys, blobs):
+            if key in neural_score_cache:
+                neural_score_cache.move_to_end(key)
+                results[key] = neural_score_cache[key]
+            elif key not in to_score:
+                to_score[key] = (path, data)
+
+        if to_score:
+            items = [decode_screenshot(data) for _, data in to_score.values()]
+            decoded = []
+            for start in range(0, len(items), NEURAL_BATCH_SIZE):
+                decoded.extend(predict_batch(learn, items[start:start + NEURAL_BATCH_SIZE]))
+
+            # Assuming the score is the first output of the regression head
+            for (key, (path, _)), row in zip(to_score.items(), decoded):
+                score = float(row[0])
+                results[key] = neural_score_cache[key] = score
+                print(f"Neural score calculated for {path}: {score:.2f}")
+            while len(neural_score_cache) > MAX_CACHED_SCORES:
+                neural_score_cache.popitem(last=False)
+
+        return [results[key] for key in keys]
+    except Exception as e:
+        if len(screenshot_paths) == 1:
+            raise
+        # One unreadable screenshot should not sink the whole batch; score individually
+        print(f"Batch neural scoring failed ({e}); falling back to per-image scoring.")
+        return [get_neural_score(path) for path in screenshot_paths]
+
 def get_neural_score(screenshot_path):
-    global learn  # Ensure 'learn' is accessible globally
     """
     Calculates the neural score for a given screenshot using a FastAI ResNet50 model.
     The model should be an image regression model that takes an image and returns a score.
+    Thin wrapper around get_neural_scores for a single image.
     """
-    if learn is None:
+    if get_learner() is None:
             return 3
 
     try:
-        # Open the image
-        img = Image.open(screenshot_path)
-        
-        # Convert image to RGB mode to ensure compatibility
-        img = img.convert("RGB")
-        
-        # Get prediction (score)
-        # The output of learn.predict(img) depends on how the model was trained.
-        # If it's a regression model, pred might be a tensor with one value.
-        # We assume the first element of the prediction is the score.
-        pred, _, _ = learn.predict(img)
-        
-        # Assuming the score is the first element of the prediction tensor
-        # and needs to be converted to a float.
-        # Adjust this based on your model's output format.
-        score = float(pred[0]) 
-        
-        print(f"Neural score calculated for {screenshot_path}: {score:.2f}")
-        return score
+        return get_neural_scores([screenshot_path])[0]
     except FileNotFoundError:
         print(f"Error: Screenshot file not found at {screenshot_path}. Returning score 0.")
         return 0
@@ -62,16 +205,38 @@ def get_neural_score(screenshot_path):
         print("--- End Traceback ---")
         return 0
 
-# Example usage (optional, for testing)
-# if __name__ == '__main__':
-#     # Create a dummy screenshot for testing if you don't have one
-#     # from PIL import Image
-#     # dummy_img = Image.new('RGB', (60, 30), color = 'red')
-#     # dummy_img.save("dummy_screenshot.png")
-#     # score = get_neural_score("dummy_screenshot.png")
-#     # print(f"Test neural score: {score}")
-#
-#     # Test with an actual image if available
-#     # Make sure 'model.pt' and an image (e.g., 'screenshot.png') are in the correct path
-#     # score = get_neural_score("screenshot.png") # Replace with a valid image path
-#     # print(f"Test neural score for screenshot.png: {score}")
+def check_neural_score_consistency(screenshot_path, tolerance=1e-2):
+    """
+    Sanity check for the direct-model path: scoring the same screenshot twice must give the
+    same value, and that value must match learn.predict. Bypasses neural_score_cache.
+    Returns True when both hold.
+    """
+    learn = get_learner()
+    if learn is None:
+        print("No neural model loaded; nothing to check.")
+        return False
+
+    with open(screenshot_path, "rb") as f:
+        item = decode_screenshot(f.read())
+    first = float(predict_batch(learn, [item])[0][0])
+    second = float(predict_batch(learn, [item])[0][0])
+    pred, _, _ = learn.predict(Image.open(screenshot_path).convert("RGB"))
+    reference = float(pred[0])
+
+    deterministic = first == second
+    matches_predict = abs(first - reference) <= tolerance
+    print(f"Direct scores: {first:.4f}, {second:.4f}; learn.predict: {reference:.4f}")
+    if not deterministic:
+        print("Error: repeated scoring of the same screenshot is not deterministic.")
+    if not matches_predict:
+        print(f"Error: direct score differs from learn.predict by more than {tolerance}.")
+    return deterministic and matches_predict
+
+# Example usage (optional, for testing):
+#     python neural_score_processor.py screenshot.png
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python neural_score_processor.py <screenshot.png>")
+        sys.exit(2)
+    sys.exit(0 if check_neural_score_consistency(sys.argv[1]) else 1)
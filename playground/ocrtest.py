@@ -2,101 +2,198 @@ from paddleocr import PaddleOCR
 import numpy as np
 import cv2
 import os
+from functools import lru_cache
 
 # Configuration
 OCR_CONFIDENCE_THRESHOLD = 0.85
-
-# Initialize OCR
-ocr = PaddleOCR(
-    use_doc_orientation_classify=False,
-    use_doc_unwarping=False,
-    use_textline_orientation=False
-)
-
-img_path = "OmniParser/pls_backup.png"
-
-# Check if image exists
-if not os.path.exists(img_path):
-    print(f"Error: Image file not found at {img_path}")
-    exit()
-
-# Load the image for OpenCV processing
-img = cv2.imread(img_path)
-if img is None:
-    print(f"Error: Could not load image from {img_path}")
-    exit()
-
-print(f"Processing image: {img_path}")
-print(f"Image dimensions: {img.shape[1]}x{img.shape[0]}")
-
-# Convert to grayscale for edge detection
-gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-# Perform Canny edge detection
-edges = cv2.Canny(gray, 20, 100)
-
-try:
-    result = ocr.predict(img_path)
-    np.set_printoptions(threshold=10000)
-
-    # Create a mask to remove text areas
-    mask = np.zeros_like(edges)
-
-    print("\n--- OCR Results ---")
-    text_boxes_found = 0
-
-    for poly, text, score in zip(result[0]['rec_polys'], result[0]['rec_texts'], result[0]['rec_scores']):
-        if score > OCR_CONFIDENCE_THRESHOLD:
-            text_boxes_found += 1
-            print(f"Text: '{text}', Score: {score:.3f}")
-            print(f"Bounding box: {poly}")
-
-            # Get bounding box coordinates
-            poly_np = np.array(poly)
-            x_coords = poly_np[:, 0]
-            y_coords = poly_np[:, 1]
-
-            x_min = int(np.min(x_coords))
-            y_min = int(np.min(y_coords))
-            x_max = int(np.max(x_coords))
-            y_max = int(np.max(y_coords))
-
-            # Expand the bounding box by a 4px margin
-            margin = 4
-            x_min_margin = max(0, x_min - margin)
-            y_min_margin = max(0, y_min - margin)
-            x_max_margin = min(img.shape[1], x_max + margin)
-            y_max_margin = min(img.shape[0], y_max + margin)
-
-            # Fill the mask within the expanded bounding box
-            cv2.rectangle(mask, (x_min_margin, y_min_margin), (x_max_margin, y_max_margin), 255, -1)
-
-    print(f"\nTotal high-confidence text boxes found: {text_boxes_found}")
-
-    # Invert the mask so that the areas *inside* the bounding boxes are black (0)
-    # and areas *outside* are white (255)
-    inverted_mask = cv2.bitwise_not(mask)
-
-    # Apply the inverted mask to the edges
-    # This will keep only the edges that are *outside* the bounding boxes
-    edges_without_text = cv2.bitwise_and(edges, inverted_mask)
-
-    # Export the cleaned edge detection image
-    output_path = "edges_without_text_boxes.png"
-    cv2.imwrite(output_path, edges_without_text)
-    print(f"\nCleaned edge detection image saved to: {output_path}")
-
-    # Optional: Save original edges for comparison
-    original_edges_path = "original_edges.png"
-    cv2.imwrite(original_edges_path, edges)
-    print(f"Original edges saved to: {original_edges_path}")
-
-    # Display the results
-    print("\nDisplaying results... Press any key to close windows.")
-    cv2.imshow("Edges Without Text", edges_without_text)
-    cv2.imshow("Original Edges", edges)
-    cv2.waitKey(0)
-    cv2.destroyAllWindows()
-
-except Exception as e:
-    print(f"Error during OCR processing: {e}")
\ No newline at end of file
+CANNY_SCALE = 0.5  # Run edge detection at this fraction of full resolution (1.0 = full size)
+TEXT_BOX_MARGIN = 4
+
+def cuda_canny_available():
+    """True when this OpenCV build has CUDA support and can see a device."""
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
+
+USE_CUDA_CANNY = cuda_canny_available()
+
+# Initialize OCR on first use, once per process, so importing this module stays cheap
+@lru_cache(maxsize=None)
+def get_ocr():
+    return PaddleOCR(
+        use_doc_orientation_classify=False,
+        use_doc_unwarping=False,
+        use_textline_orientation=False
+    )
+
+class EdgeTextRemover:
+    """
+    Canny edge map with the OCR text polygons blanked out.
+    All working buffers are allocated once for a fixed image size and reused on every
+    call, so a stream of same-sized screenshots causes no per-frame allocations.
+    """
+    def __init__(self, height, width, canny_scale=CANNY_SCALE,
+                 threshold=OCR_CONFIDENCE_THRESHOLD, margin=TEXT_BOX_MARGIN, use_cuda=USE_CUDA_CANNY):
+        self.height, self.width = height, width
+        self.canny_scale = canny_scale
+        self.use_cuda = use_cuda
+        self.threshold = threshold
+        self.margin = margin
+        self.kept_boxes = np.empty(0, np.intp)  # Indices of the OCR boxes used by the last text_mask
+
+        self.gray = np.empty((height, width), np.uint8)
+        self.edges = np.empty((height, width), np.uint8)
+        self.mask = np.empty((height, width), np.uint8)
+        self.edges_without_text = np.empty((height, width), np.uint8)
+        if margin > 0:
+            self.text_polys = np.empty((height, width), np.uint8)
+            self.margin_kernel = np.ones((2 * margin + 1, 2 * margin + 1), np.uint8)
+
+        if canny_scale < 1.0:
+            self.small_size = (max(1, round(width * canny_scale)), max(1, round(height * canny_scale)))
+            self.small = np.empty(self.small_size[::-1], np.uint8)
+            self.small_edges = np.empty(self.small_size[::-1], np.uint8)
+
+        if use_cuda:
+            # Device-side counterparts of the buffers above, reused the same way
+            self.gpu_img = cv2.cuda_GpuMat(height, width, cv2.CV_8UC3)
+            self.gpu_gray = cv2.cuda_GpuMat(height, width, cv2.CV_8UC1)
+            self.gpu_edges = cv2.cuda_GpuMat(height, width, cv2.CV_8UC1)
+            if canny_scale < 1.0:
+                self.gpu_small = cv2.cuda_GpuMat(self.small_size[1], self.small_size[0], cv2.CV_8UC1)
+                self.gpu_small_edges = cv2.cuda_GpuMat(self.small_size[1], self.small_size[0], cv2.CV_8UC1)
+            self.canny_detector = cv2.cuda.createCannyEdgeDetector(20, 100)
+
+    def edge_map(self, img):
+        """Grayscale + Canny into self.edges, on a downscaled copy when canny_scale < 1."""
+        if self.use_cuda:
+            return self.edge_map_cuda(img)
+        cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        if self.canny_scale < 1.0:
+            cv2.resize(self.gray, self.small_size, dst=self.small, interpolation=cv2.INTER_AREA)
+            cv2.Canny(self.small, 20, 100, edges=self.small_edges)
+            cv2.resize(self.small_edges, (self.width, self.height), dst=self.edges,
+                       interpolation=cv2.INTER_NEAREST)
+        else:
+            cv2.Canny(self.gray, 20, 100, edges=self.edges)
+        return self.edges
+
+    def edge_map_cuda(self, img):
+        """Same as edge_map, with grayscale, resizes and Canny running on the GPU."""
+        self.gpu_img.upload(img)
+        cv2.cuda.cvtColor(self.gpu_img, cv2.COLOR_BGR2GRAY, dst=self.gpu_gray)
+        if self.canny_scale < 1.0:
+            cv2.cuda.resize(self.gpu_gray, self.small_size, dst=self.gpu_small, interpolation=cv2.INTER_AREA)
+            self.canny_detector.detect(self.gpu_small, self.gpu_small_edges)
+            cv2.cuda.resize(self.gpu_small_edges, (self.width, self.height), dst=self.gpu_edges,
+                            interpolation=cv2.INTER_NEAREST)
+        else:
+            self.canny_detector.detect(self.gpu_gray, self.gpu_edges)
+        self.gpu_edges.download(self.edges)
+        return self.edges
+
+    def text_mask(self, result):
+        """
+        Fills self.mask with the high-confidence OCR polygons, grown by the margin.
+        Returns the indices of the boxes that passed the threshold (also kept in self.kept_boxes).
+        """
+        self.mask.fill(0)
+
+        # Select high-confidence boxes with one vectorized comparison
+        scores = np.asarray(result[0]['rec_scores'], dtype=np.float32)
+        keep = self.kept_boxes = np.flatnonzero(scores > self.threshold)
+        if len(keep) == 0:
+            return keep
+        polys = np.asarray(result[0]['rec_polys'], dtype=np.float32).reshape(len(scores), -1, 2)[keep]
+
+        # Rasterise the actual text polygons (not their axis-aligned bounding boxes) in one call,
+        # so edges that merely share a bounding box with rotated or slanted text survive
+        contours = polys.astype(np.int32).reshape(len(keep), -1, 1, 2)
+        if self.margin > 0:
+            self.text_polys.fill(0)
+            cv2.fillPoly(self.text_polys, list(contours), 255, lineType=cv2.LINE_8)
+            # Grow every polygon by the margin in a single pass
+            cv2.dilate(self.text_polys, self.margin_kernel, dst=self.mask)
+        else:
+            cv2.fillPoly(self.mask, list(contours), 255, lineType=cv2.LINE_8)
+        return keep
+
+    def __call__(self, img, result=None):
+        """
+        Returns the edge map of img with text areas zeroed. OCR is run on img unless
+        a PaddleOCR result for it is passed in. The returned array is reused by the next call.
+        Raises ValueError if img is not the size the buffers were allocated for.
+        """
+        # With a mismatched dst, cv2 silently allocates a new array and our buffers keep stale memory
+        if img.shape[:2] != (self.height, self.width):
+            raise ValueError(f"EdgeTextRemover is sized for {self.width}x{self.height}, "
+                             f"got a {img.shape[1]}x{img.shape[0]} image")
+        if result is None:
+            result = get_ocr().predict(img)
+        self.edge_map(img)
+        self.text_mask(result)
+
+        # Zero the edges *inside* the bounding boxes, keeping only the edges outside them
+        np.copyto(self.edges_without_text, self.edges)
+        self.edges_without_text[self.mask != 0] = 0
+        return self.edges_without_text
+
+def main(img_path="OmniParser/pls_backup.png", show=True):
+    # Check if image exists
+    if not os.path.exists(img_path):
+        print(f"Error: Image file not found at {img_path}")
+        return
+
+    # Load the image for OpenCV processing
+    img = cv2.imread(img_path)
+    if img is None:
+        print(f"Error: Could not load image from {img_path}")
+        return
+
+    print(f"Processing image: {img_path}")
+    print(f"Image dimensions: {img.shape[1]}x{img.shape[0]}")
+
+    remover = EdgeTextRemover(img.shape[0], img.shape[1])
+
+    try:
+        # Reuse the already-decoded BGR image instead of having PaddleOCR read the file again
+        result = get_ocr().predict(img)
+        np.set_printoptions(threshold=10000)
+
+        edges_without_text = remover(img, result)
+        edges = remover.edges
+
+        print("\n--- OCR Results ---")
+        # Report exactly the boxes the remover masked, using its threshold
+        scores = result[0]['rec_scores']
+        keep = remover.kept_boxes
+        for i in keep:
+            print(f"Text: '{result[0]['rec_texts'][i]}', Score: {scores[i]:.3f}")
+            print(f"Bounding box: {result[0]['rec_polys'][i]}")
+
+        print(f"\nTotal high-confidence text boxes found: {len(keep)}")
+
+        # Export the cleaned edge detection image
+        output_path = "edges_without_text_boxes.png"
+        cv2.imwrite(output_path, edges_without_text)
+        print(f"\nCleaned edge detection image saved to: {output_path}")
+
+        # Optional: Save original edges for comparison
+        original_edges_path = "original_edges.png"
+        cv2.imwrite(original_edges_path, edges)
+        print(f"Original edges saved to: {original_edges_path}")
+
+        # Display the results
+        if show:
+            print("\nDisplaying results... Press any key to close windows.")
+            cv2.imshow("Edges Without Text", edges_without_text)
+            cv2.imshow("Original Edges", edges)
+            cv2.waitKey(0)
+            cv2.destroyAllWindows()
+
+    except Exception as e:
+        print(f"Error during OCR processing: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,12 @@ import cv2
 import numpy as np
 import os
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from paddleocr import PaddleOCR
 
+# Overlay colors indexed by edge class: background, major (white), isolated minor (red), connected minor (yellow)
+EDGE_OVERLAY_PALETTE = np.array([[0, 0, 0], [255, 255, 255], [0, 0, 255], [0, 255, 255]], dtype=np.uint8)
+
 class OCREdgeDetectionGUI:
     def __init__(self, root):
         self.root = root
@@ -27,6 +31,9 @@ class OCREdgeDetectionGUI:
         self.cleaned_contours_image = None  # For contour detection on cleaned edges
         self.merged_view_image = None  # For merged view of minor element boxes + rectangular major contours
         self.ocr_results = None
+        # Single OCR worker: lets OCR overlap the CV stages while keeping predict calls serialized
+        self.ocr_executor = ThreadPoolExecutor(max_workers=1)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         self.setup_ui()
         self.initialize_ocr()
@@ -312,18 +319,19 @@ class OCREdgeDetectionGUI:
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN)
         status_bar.pack(fill=tk.X, pady=(10, 0))
     
+    def on_close(self):
+        """Drop queued OCR work instead of waiting for it, then close the window"""
+        self.ocr_executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+    
     def initialize_ocr(self):
         """Initialize PaddleOCR in a separate thread"""
         def init_ocr():
             try:
                 self.status_var.set("Initializing OCR...")
                 self.progress.start()
-                self.ocr = PaddleOCR(
-                    use_doc_orientation_classify=False,
-                    use_doc_unwarping=False,
-                    use_textline_orientation=False
-                )
-                self.status_var.set("OCR initialized successfully")
+                self.ocr, backend = self.create_ocr()
+                self.status_var.set(f"OCR initialized successfully ({backend})")
                 self.progress.stop()
             except Exception as e:
                 self.status_var.set(f"OCR initialization failed: {str(e)}")
@@ -332,6 +340,40 @@ class OCREdgeDetectionGUI:
         
         threading.Thread(target=init_ocr, daemon=True).start()
     
+    def create_ocr(self):
+        """
+        Build PaddleOCR with the fastest inference backend this machine supports.
+        Tries high-performance inference (HPI) and FP16 TensorRT on a CUDA GPU, HPI on CPU,
+        and falls back to the default FP32 configuration if those libraries are missing.
+        Returns the OCR instance and a short description of the backend used.
+        """
+        base_config = dict(
+            use_doc_orientation_classify=False,
+            use_doc_unwarping=False,
+            use_textline_orientation=False
+        )
+        try:
+            import paddle
+            has_gpu = paddle.device.is_compiled_with_cuda() and paddle.device.cuda.device_count() > 0
+        except Exception:
+            has_gpu = False
+        
+        if has_gpu:
+            attempts = [
+                ("GPU, high-performance inference", dict(device="gpu", enable_hpi=True)),
+                ("GPU, TensorRT FP16", dict(device="gpu", use_tensorrt=True, precision="fp16")),
+                ("GPU", dict(device="gpu")),
+            ]
+        else:
+            attempts = [("CPU, high-performance inference", dict(device="cpu", enable_hpi=True))]
+        
+        for backend, extra_config in attempts:
+            try:
+                return PaddleOCR(**base_config, **extra_config), backend
+            except Exception as e:
+                print(f"OCR backend '{backend}' unavailable, trying next: {e}")
+        return PaddleOCR(**base_config), "default"
+    
     def update_threshold_label(self, value):
         self.threshold_label.config(text=f"{float(value):.2f}")
         self.OCR_CONFIDENCE_THRESHOLD = float(value)
@@ -424,15 +466,20 @@ class OCREdgeDetectionGUI:
                 self.progress.start()
                 self.process_btn.config(state=tk.DISABLED)
                 
+                # Start OCR first so it runs while the edge detection below happens
+                # Convert BGR to RGB for PaddleOCR
+                rgb_for_ocr = cv2.cvtColor(self.original_cv_image, cv2.COLOR_BGR2RGB)
+                ocr_future = self.ocr_executor.submit(self.ocr.predict, rgb_for_ocr)
+                
                 # Convert to grayscale for edge detection
                 gray = cv2.cvtColor(self.original_cv_image, cv2.COLOR_BGR2GRAY)
                 
                 # Perform Canny edge detection
                 edges = cv2.Canny(gray, 20, 100)
-                self.edges_image = edges.copy()                # Run OCR
-                # Convert BGR to RGB for PaddleOCR
-                rgb_for_ocr = cv2.cvtColor(self.original_cv_image, cv2.COLOR_BGR2RGB)
-                result = self.ocr.predict(rgb_for_ocr)
+                self.edges_image = edges.copy()
+                
+                # Masking needs the OCR boxes, so wait for them here
+                result = ocr_future.result()
                 
                 # Create mask to remove text areas
                 mask = np.zeros_like(edges)
@@ -443,36 +490,36 @@ class OCREdgeDetectionGUI:
                 bounding_boxes = []
                 
                 if result and result[0]:
-                    for poly, text, score in zip(result[0]['rec_polys'], result[0]['rec_texts'], result[0]['rec_scores']):
-                          if score > self.OCR_CONFIDENCE_THRESHOLD:
-                            text_boxes_found += 1
+                    scores = np.asarray(result[0]['rec_scores'], dtype=np.float32)
+                    keep = np.flatnonzero(scores > self.OCR_CONFIDENCE_THRESHOLD).tolist()
+                    text_boxes_found = len(keep)
+                    
+                    if keep:
+                        # Stack the kept polygons once and reduce to bounding boxes in two calls
+                        polys = np.stack([np.asarray(result[0]['rec_polys'][i]) for i in keep])
+                        mins = polys.min(axis=1).astype(np.int32)
+                        maxs = polys.max(axis=1).astype(np.int32)
+                        
+                        for i, (x_min, y_min), (x_max, y_max) in zip(keep, mins.tolist(), maxs.tolist()):
+                            text = result[0]['rec_texts'][i]
+                            score = result[0]['rec_scores'][i]
                             results_text += f"Text: '{text}'\n"
                             results_text += f"Score: {score:.3f}\n"
-                            results_text += f"Bounding box: {poly}\n\n"
-                            
-                            # Convert poly to numpy array
-                            poly_np = np.array(poly)
-                            x_coords = poly_np[:, 0]
-                            y_coords = poly_np[:, 1]
-                            
-                            x_min = int(np.min(x_coords))
-                            y_min = int(np.min(y_coords))
-                            x_max = int(np.max(x_coords))
-                            y_max = int(np.max(y_coords))
+                            results_text += f"Bounding box: {result[0]['rec_polys'][i]}\n\n"
                             
                             # Store for visualization
                             bounding_boxes.append((x_min, y_min, x_max, y_max, text, score))
-                            
-                            # Expand bounding box by 4px margin
-                            margin = 4
-                            x_min_margin = max(0, x_min - margin)
-                            y_min_margin = max(0, y_min - margin)
-                            x_max_margin = min(self.original_cv_image.shape[1], x_max + margin)
-                            y_max_margin = min(self.original_cv_image.shape[0], y_max + margin)
-                            
-                            # Fill mask
-                            cv2.rectangle(mask, (x_min_margin, y_min_margin), 
-                                        (x_max_margin, y_max_margin), 255, -1)
+                        
+                        # Expand bounding boxes by 4px margin and clip to the image, in place
+                        margin = 4
+                        mins -= margin
+                        maxs += margin
+                        np.clip(mins, 0, None, out=mins)
+                        np.minimum(maxs, [self.original_cv_image.shape[1], self.original_cv_image.shape[0]], out=maxs)
+                        
+                        # Fill mask (bounds are inclusive, like cv2.rectangle)
+                        for (x_min, y_min), (x_max, y_max) in zip(mins.tolist(), maxs.tolist()):
+                            mask[y_min:y_max + 1, x_min:x_max + 1] = 255
                 
                 results_text += f"Total high-confidence text boxes found: {text_boxes_found}\n"
                   # Apply mask to edges
@@ -493,23 +540,17 @@ class OCREdgeDetectionGUI:
                   # Create minor edges visualization (edges that were removed)
                 self.minor_edges_image = cv2.subtract(edges_without_text, self.major_edges_image)
                 
-                # Create overlay image showing edge types with different colors
-                self.edge_overlay_image = np.zeros((edges.shape[0], edges.shape[1], 3), dtype=np.uint8)
-                
-                # Set major edges to white
-                self.edge_overlay_image[self.major_edges_image > 0] = [255, 255, 255]
-                
                 # Identify isolated vs. connected minor edges
                 connected_minor_edges, isolated_minor_edges = self.classify_minor_edges(
                     self.minor_edges_image, self.major_edges_image, proximity_value
                 )
                 
-                # Set isolated minor edges to red
-                self.edge_overlay_image[isolated_minor_edges > 0] = [0, 0, 255]
+                # Create overlay image showing edge types with different colors
+                self.edge_overlay_image = self.build_edge_overlay(
+                    self.major_edges_image, isolated_minor_edges, connected_minor_edges
+                )
                 
-                # Set connected minor edges to yellow (these are close to major edges)
-                self.edge_overlay_image[connected_minor_edges > 0] = [0, 255, 255]
-                  # Generate straight edges using Hough Line Transform on major edges
+                # Generate straight edges using Hough Line Transform on major edges
                 self.straight_edges_image = self.apply_hough_transform(
                     self.major_edges_image, 
                     threshold=50, 
@@ -708,22 +749,17 @@ class OCREdgeDetectionGUI:
             # Create minor edges visualization
             self.minor_edges_image = cv2.subtract(current_image, self.major_edges_image)
             
-            # Create overlay image showing edge types with different colors
-            self.edge_overlay_image = np.zeros((current_image.shape[0], current_image.shape[1], 3), dtype=np.uint8)
-            
-            # Set major edges to white
-            self.edge_overlay_image[self.major_edges_image > 0] = [255, 255, 255]
-            
             # Identify isolated vs. connected minor edges
             connected_minor_edges, isolated_minor_edges = self.classify_minor_edges(
                 self.minor_edges_image, self.major_edges_image, proximity_value
             )
             
-            # Set isolated minor edges to red
-            self.edge_overlay_image[isolated_minor_edges > 0] = [0, 0, 255]
+            # Create overlay image showing edge types with different colors
+            self.edge_overlay_image = self.build_edge_overlay(
+                self.major_edges_image, isolated_minor_edges, connected_minor_edges
+            )
             
-            # Set connected minor edges to yellow (these are close to major edges)
-            self.edge_overlay_image[connected_minor_edges > 0] = [0, 255, 255]            # Generate straight edges using Hough Line Transform on major edges
+            # Generate straight edges using Hough Line Transform on major edges
             self.straight_edges_image = self.apply_hough_transform(
                 self.major_edges_image, 
                 threshold=50, 
@@ -834,76 +870,43 @@ class OCREdgeDetectionGUI:
         # Find connected components
         num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(edge_image, connectivity=8)
         
-        # Create output images
-        major_edges = np.zeros_like(edge_image)
-        
-        # If proximity_threshold is 0, use the original behavior - just filter by size
-        if proximity_threshold == 0:
-            # Original behavior - just filter by size
-            for i in range(1, num_labels):
-                width = stats[i, cv2.CC_STAT_WIDTH]
-                height = stats[i, cv2.CC_STAT_HEIGHT]
-                
-                # Check if component is larger than min_size in either dimension
-                if width > min_size or height > min_size:
-                    # Keep this component as a major edge
-                    component_mask = (labels == i).astype(np.uint8) * 255
-                    major_edges = cv2.bitwise_or(major_edges, component_mask)
-            
-            return major_edges
-        
-        # Otherwise, use the pixel-based proximity filtering
+        # Per-label decision table: a component is major if it is larger than min_size in either dimension
+        is_major = (stats[:, cv2.CC_STAT_WIDTH] > min_size) | (stats[:, cv2.CC_STAT_HEIGHT] > min_size)
+        is_major[0] = False  # Background
         
-        # First pass: Identify large components only
-        for i in range(1, num_labels):
-            width = stats[i, cv2.CC_STAT_WIDTH]
-            height = stats[i, cv2.CC_STAT_HEIGHT]
-            
-            # Check if component is larger than min_size in either dimension
-            if width > min_size or height > min_size:
-                # Keep this component as a major edge
-                component_mask = (labels == i).astype(np.uint8) * 255
-                major_edges = cv2.bitwise_or(major_edges, component_mask)
-        
-        # Create a dilated version of major edges to check for proximity
+        # With proximity_threshold 0 components are filtered by size only
         if proximity_threshold > 0:
+            # Pixel-based proximity filtering: small components that touch the dilated
+            # major edges are kept too (dilation uses the size-only major set, no cascading)
+            major_edges = np.where(is_major, 255, 0).astype(np.uint8)[labels]
             kernel = np.ones((proximity_threshold, proximity_threshold), np.uint8)
             dilated_major_edges = cv2.dilate(major_edges, kernel, iterations=1)
-        else:
-            dilated_major_edges = major_edges.copy()
-        
-        # Second pass: Check small components for proximity to major edges
-        for i in range(1, num_labels):
-            width = stats[i, cv2.CC_STAT_WIDTH]
-            height = stats[i, cv2.CC_STAT_HEIGHT]
-            
-            # Skip components that are already marked as major
-            if width > min_size or height > min_size:
-                continue
-                
-            # Get mask for this small component
-            component_mask = (labels == i).astype(np.uint8) * 255
-            
-            # Check if the component overlaps with the dilated major edges
-            # Note: We're checking actual pixel proximity, not bounding box proximity
-            overlap = cv2.bitwise_and(component_mask, dilated_major_edges)
             
-            # If this component is close enough to major edge pixels, include it
-            if np.any(overlap):
-                major_edges = cv2.bitwise_or(major_edges, component_mask)
+            # Every label with at least one pixel under the dilated mask
+            is_major[np.unique(labels[dilated_major_edges > 0])] = True
+            is_major[0] = False
+        
+        # Map labels through the table in one gather
+        major_edges = np.where(is_major, 255, 0).astype(np.uint8)[labels]
         
         return major_edges    
+    def build_edge_overlay(self, major_edges, isolated_minor_edges, connected_minor_edges):
+        """Color edges by type: major white, isolated minor red, connected minor yellow.
+        Pixels are classified in a single-channel label image, then colored with one palette lookup"""
+        # Later classes take priority, matching the order the colors used to be painted in
+        edge_classes = (major_edges > 0).astype(np.uint8)
+        edge_classes[isolated_minor_edges > 0] = 2
+        edge_classes[connected_minor_edges > 0] = 3
+        return EDGE_OVERLAY_PALETTE[edge_classes]
+    
     def classify_minor_edges(self, minor_edges_image, major_edges_image, proximity_threshold):
         """Classify minor edges as either connected to major edges or isolated"""
         # Find connected components in minor edges
         num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(minor_edges_image, connectivity=8)
         
-        # Create output images
-        connected_minor_edges = np.zeros_like(minor_edges_image)
-        isolated_minor_edges = np.zeros_like(minor_edges_image)
-        
         # If proximity_threshold is 0, all minor edges are considered isolated
         if proximity_threshold == 0:
+            connected_minor_edges = np.zeros_like(minor_edges_image)
             isolated_minor_edges = minor_edges_image.copy()
             return connected_minor_edges, isolated_minor_edges
         
@@ -912,21 +915,17 @@ class OCREdgeDetectionGUI:
         kernel = np.ones((proximity_threshold, proximity_threshold), np.uint8)
         major_edges_dilated = cv2.dilate(major_edges_image, kernel, iterations=1)
         
-        # For each minor edge component
-        for i in range(1, num_labels):
-            # Get component mask
-            component_mask = (labels == i).astype(np.uint8) * 255
-            
-            # Check if any pixels of this component are close to major edge pixels
-            # by checking overlap with the dilated major edges
-            overlap = cv2.bitwise_and(component_mask, major_edges_dilated)
-            
-            if np.any(overlap):
-                # This component has pixels close to major edge pixels
-                connected_minor_edges = cv2.bitwise_or(connected_minor_edges, component_mask)
-            else:
-                # This component is isolated from major edges
-                isolated_minor_edges = cv2.bitwise_or(isolated_minor_edges, component_mask)
+        # A whole component is connected if any of its pixels fall inside the proximity zone;
+        # collect those labels at once instead of testing each component's mask
+        is_connected = np.zeros(num_labels, dtype=bool)
+        is_connected[np.unique(labels[major_edges_dilated > 0])] = True
+        is_connected[0] = False  # Background
+        is_isolated = ~is_connected
+        is_isolated[0] = False
+        
+        # Map labels to the two output images with one lookup each
+        connected_minor_edges = np.where(is_connected, 255, 0).astype(np.uint8)[labels]
+        isolated_minor_edges = np.where(is_isolated, 255, 0).astype(np.uint8)[labels]
         
         return connected_minor_edges, isolated_minor_edges
     def apply_hough_transform(self, edge_image, threshold=50, min_line_length=50, max_line_gap=5):
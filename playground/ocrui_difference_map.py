@@ -2,6 +2,7 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 from PIL import Image, ImageTk
 import cv2
 import numpy as np
+import threading
 from paddleocr import PaddleOCR
 
 class OCRDifferenceMapGUI:
@@ -15,6 +16,7 @@ class OCRDifferenceMapGUI:
         self.difference_map = None
         self.contours_image = None
         self.ocr_results = None
+        self.ocr_job = 0  # Incremented per OCR run; stale results are discarded
 
         self.setup_ui()
 
@@ -28,7 +30,8 @@ class OCRDifferenceMapGUI:
         control_frame.pack(fill="x", pady=(0, 10))
 
         # File selection
-        ttk.Button(control_frame, text="Load Image", command=self.load_image).pack(side="left", padx=(0, 10))
+        self.load_btn = ttk.Button(control_frame, text="Load Image", command=self.load_image)
+        self.load_btn.pack(side="left", padx=(0, 10))
 
         # Process button
         self.process_btn = ttk.Button(control_frame, text="Process Image", command=self.process_image, state="disabled")
@@ -102,25 +105,56 @@ class OCRDifferenceMapGUI:
         self.difference_map = dilated_difference_map
         self.display_image(self.difference_map, self.difference_canvas, cmap="gray")
 
-        # Apply OCR mask
-        ocr_results = self.ocr.ocr(self.current_image, cls=True)
-        ocr_mask = np.zeros_like(self.difference_map, dtype=np.uint8)
-        for result in ocr_results[0]:
-            box = np.array(result[0]).astype(np.int32)
-            cv2.fillPoly(ocr_mask, [box], 255)
-
-        # Mask the difference map
-        masked_difference_map = cv2.bitwise_and(self.difference_map, self.difference_map, mask=cv2.bitwise_not(ocr_mask))
-
-        # Detect contours on the masked difference map
-        contours, _ = cv2.findContours(masked_difference_map, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        contours_image = np.zeros_like(self.difference_map)
-        cv2.drawContours(contours_image, contours, -1, (255, 255, 255), thickness=1)
+        # OCR takes seconds per image, so run it off the Tk thread and hand the result back via after()
+        # The PaddleOCR instance is not thread-safe, so block new loads/runs until this one reports back
+        self.ocr_job += 1
+        self.process_btn.configure(state="disabled", text="Processing...")
+        self.load_btn["state"] = "disabled"
+        self.export_btn["state"] = "disabled"
+        threading.Thread(target=self.run_ocr_mask, args=(self.ocr_job, self.current_image, self.difference_map),
+                         daemon=True).start()
+
+    def run_ocr_mask(self, job, image, difference_map):
+        try:
+            # Apply OCR mask
+            ocr_results = self.ocr.ocr(image, cls=True)
+            ocr_mask = np.zeros_like(difference_map, dtype=np.uint8)
+            for result in ocr_results[0]:
+                box = np.array(result[0]).astype(np.int32)
+                cv2.fillPoly(ocr_mask, [box], 255)
+
+            # Mask the difference map
+            masked_difference_map = cv2.bitwise_and(difference_map, difference_map, mask=cv2.bitwise_not(ocr_mask))
+
+            # Detect contours on the masked difference map
+            contours, _ = cv2.findContours(masked_difference_map, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            contours_image = np.zeros_like(difference_map)
+            cv2.drawContours(contours_image, contours, -1, (255, 255, 255), thickness=1)
+            self.root.after(0, lambda: self.show_contours(job, contours_image))
+        except Exception as e:
+            error_msg = f"OCR processing failed: {e}"
+            self.root.after(0, lambda: self.show_processing_error(job, error_msg))
+
+    def finish_ocr_job(self, job):
+        """Re-enables the controls; returns False if job is not the latest run (its result is stale)."""
+        if job != self.ocr_job:
+            return False
+        self.process_btn.configure(state="normal", text="Process Image")
+        self.load_btn["state"] = "normal"
+        return True
+
+    def show_contours(self, job, contours_image):
+        if not self.finish_ocr_job(job):
+            return
         self.contours_image = contours_image
         self.display_image(self.contours_image, self.contours_canvas, cmap="gray")
-
         self.export_btn["state"] = "normal"
 
+    def show_processing_error(self, job, error_msg):
+        if not self.finish_ocr_job(job):
+            return
+        messagebox.showerror("Error", error_msg)
+
     def export_results(self):
         if self.difference_map is None or self.contours_image is None:
             messagebox.showerror("Error", "No results to export.")
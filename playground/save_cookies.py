@@ -3,6 +3,11 @@ import json
 import os
 from playwright.async_api import async_playwright
 
+try:
+    import orjson  # optional C serialiser, several times faster than json
+except ImportError:
+    orjson = None
+
 COOKIES_FILE = "cookies.json"
 
 async def main():
@@ -88,8 +93,14 @@ async def main():
                     print("INFO: This often means the browser closed too abruptly or the context became invalid.")
                 
                 if cookies:
-                    with open(COOKIES_FILE, "w") as f:
-                        json.dump(cookies, f, indent=2)
+                    # Serialise once and write a single buffer; json.dump
+                    # issues one write() per token.
+                    if orjson is not None:
+                        payload = orjson.dumps(cookies, option=orjson.OPT_INDENT_2)
+                    else:
+                        payload = json.dumps(cookies, indent=2).encode("utf-8")
+                    with open(COOKIES_FILE, "wb") as f:
+                        f.write(payload)
                     print(f"SUCCESS: Saved {len(cookies)} cookies to {COOKIES_FILE}")
                 else:
                     # Check if the failure was due to an error or genuinely no cookies